@@ -0,0 +1,318 @@
+import os, time, tracemalloc, subprocess, argparse, string
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from itertools import product
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from sklearn import cluster
+import scipy as sp
+from scipy.cluster.hierarchy import linkage
+
+import analyze
+
+
+"""This module benchmarks the distance, clustering and scoring functions in analyze on synthetic and sample data"""
+
+
+
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'results.csv')
+
+SIZES = {
+    'quick': {'words': [10, 50], 'languages': [10, 40], 'word_length': [4, 8]},
+    'full': {'words': [10, 50, 200], 'languages': [10, 40, 120], 'word_length': [4, 8, 12]}
+}
+
+SAMPLE_DATA = pd.DataFrame(
+    [
+        ['mother', 'mutter', 'madre', 'mère', 'madre', 'moeder', 'mãe', 'mor'],
+        ['father', 'vater', 'padre', 'père', 'padre', 'vader', 'pai', 'far'],
+        ['water', 'wasser', 'agua', 'eau', 'acqua', 'water', 'água', 'vatten'],
+        ['night', 'nacht', 'noche', 'nuit', 'notte', 'nacht', 'noite', 'natt'],
+        ['hand', 'hand', 'mano', 'main', 'mano', 'hand', 'mão', 'hand'],
+        ['tree', 'baum', 'árbol', 'arbre', 'albero', 'boom', 'árvore', 'träd'],
+        ['fish', 'fisch', 'pez', 'poisson', 'pesce', 'vis', 'peixe', 'fisk'],
+        ['star', 'stern', 'estrella', 'étoile', 'stella', 'ster', 'estrela', 'stjärna'],
+        ['two', 'zwei', 'dos', 'deux', 'due', 'twee', 'dois', 'två'],
+        ['sun', 'sonne', 'sol', 'soleil', 'sole', '', 'sol', 'sol']
+    ],
+    index=pd.Series(['mother', 'father', 'water', 'night', 'hand', 'tree', 'fish', 'star', 'two', 'sun'], name='word'),
+    columns=['en', 'de', 'es', 'fr', 'it', 'nl', 'pt', 'sv']
+)
+
+SAMPLE_FAMILIES = pd.Series(
+    ['Germanic', 'Germanic', 'Italic', 'Italic', 'Italic', 'Germanic', 'Italic', 'Germanic'],
+    index=SAMPLE_DATA.columns
+)
+
+
+
+def synthetic_data(num_words:int, num_languages:int, word_length:int, mutation_rate:float=0.3, seed:int=0)->pd.DataFrame:
+    """Random transliteration data shaped like data-latin.csv. Every language mutates the same base word, so rows are related
+
+    Args:
+        num_words (int): Number of rows (words)
+        num_languages (int): Number of columns (languages)
+        word_length (int): Average word length
+        mutation_rate (float, optional): Probability of substituting each character of the base word. Defaults to 0.3.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: DataFrame of transliterations where columns are languages and rows are words
+    """
+
+    rng = np.random.default_rng(seed)
+    letters = np.array(list(string.ascii_lowercase))
+
+    rows = []
+
+    for _ in range(num_words):
+        base = rng.choice(letters, size=word_length + 1)
+        row = []
+
+        for _ in range(num_languages):
+            word = np.where(rng.random(word_length + 1) < mutation_rate, rng.choice(letters, size=word_length + 1), base)
+            length = max(1, word_length + rng.integers(-1, 2))
+            row.append(''.join(word[:length]))
+
+        rows.append(row)
+
+    index = pd.Series(['word{}'.format(i) for i in range(num_words)], name='word')
+    columns = ['lang{}'.format(i) for i in range(num_languages)]
+
+    return pd.DataFrame(rows, index=index, columns=columns)
+
+
+
+def _distance_matrix(data:pd.DataFrame)->np.ndarray:
+    X = analyze.pairwise_word_distances(data).sum()
+    return X/max(X.max(), 1)
+
+
+
+def _fit_clustering(X:np.ndarray):
+    kwargs = {'n_clusters': None, 'distance_threshold': 0, 'compute_distances': True, 'linkage': 'average'}
+
+    # scikit-learn renamed affinity to metric in 1.2
+    try:
+        model = cluster.AgglomerativeClustering(metric='precomputed', **kwargs)
+    except TypeError:
+        model = cluster.AgglomerativeClustering(affinity='precomputed', **kwargs)
+
+    return model.fit(X)
+
+
+
+def get_cases(data:pd.DataFrame, labels:pd.Series=None, seed:int=0, functions:list=None)->dict:
+    """Benchmark cases for a dataset. Setup work (fitting models etc) happens here and is not timed
+
+    Args:
+        data (pd.DataFrame): DataFrame of transliterations where columns are languages and rows are words
+        labels (pd.Series, optional): True label for each language. Defaults to random labels.
+        seed (int, optional): Random seed for the random labels. Defaults to 0.
+        functions (list, optional): Names of cases to build. Defaults to None (all).
+
+    Returns:
+        dict: Function name -> callable taking no arguments
+    """
+
+    rng = np.random.default_rng(seed)
+    num_languages = data.shape[1]
+
+    if labels is None:
+        labels = rng.integers(0, max(2, num_languages//4), size=num_languages)
+
+    pred_labels = rng.integers(0, max(2, num_languages//4), size=num_languages)
+
+    leaf_labels = list(data.columns)
+
+    def plot(Z, circular):
+        if circular:
+            fig, ax = plt.subplots(subplot_kw={'projection': 'polar'})
+            analyze.plot_dendrogram(Z, circular=True, labels=leaf_labels, ax=ax)
+        else:
+            fig, ax = plt.subplots()
+            analyze.plot_dendrogram(Z, labels=leaf_labels, ax=ax)
+        plt.close(fig)
+
+    cases = {
+        'pairwise_word_distances': lambda: analyze.pairwise_word_distances(data),
+        'dist_to_word': lambda: data.T.apply(lambda x: analyze.dist_to_word(x, x.iloc[0])),
+        'score_model': lambda: analyze.score_model(pred_labels, labels)
+    }
+
+    # Clustering needs every pairwise distance, so it is only set up when a case needs it
+    clustering_cases = ['get_linkage_matrix', 'plot_dendrogram', 'plot_dendrogram_circular']
+
+    if not functions or any(name in functions for name in clustering_cases):
+        X = _distance_matrix(data)
+        Z = linkage(sp.spatial.distance.squareform(X, checks=False), method='average')
+
+        cases['plot_dendrogram'] = lambda: plot(Z, False)
+        cases['plot_dendrogram_circular'] = lambda: plot(Z, True)
+
+    if not functions or 'get_linkage_matrix' in functions:
+        model = _fit_clustering(X)
+        cases['get_linkage_matrix'] = lambda: analyze.get_linkage_matrix(model)
+
+    if functions:
+        cases = {name: func for name, func in cases.items() if name in functions}
+
+    return cases
+
+
+
+def measure(func, repeat:int=3)->dict:
+    """Time a function and record its peak memory. Memory is traced in a separate call so it does not slow the timings
+
+    Args:
+        func (callable): Function taking no arguments
+        repeat (int, optional): Number of timed calls. Defaults to 3.
+
+    Returns:
+        dict: Minimum and mean time in seconds and peak memory in MB
+    """
+
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'time_min': min(times), 'time_mean': sum(times)/len(times), 'peak_memory_mb': peak/2**20}
+
+
+
+def _commit()->str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+
+def run_benchmarks(sizes:str='quick', repeat:int=3, functions:list=None)->pd.DataFrame:
+    """Run every benchmark case on the sample data and on synthetic data of every size
+
+    Args:
+        sizes (str, optional): Key of SIZES to use for the synthetic data. Defaults to 'quick'.
+        repeat (int, optional): Number of timed calls per case. Defaults to 3.
+        functions (list, optional): Names of functions to benchmark. Defaults to None (all).
+
+    Returns:
+        pd.DataFrame: One row per function and dataset
+    """
+
+    datasets = [('sample', SAMPLE_DATA.fillna(''), SAMPLE_FAMILIES)]
+
+    grid = SIZES[sizes]
+    for num_words, num_languages, word_length in product(grid['words'], grid['languages'], grid['word_length']):
+        datasets.append(('synthetic', synthetic_data(num_words, num_languages, word_length), None))
+
+    run = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    commit = _commit()
+
+    results = []
+
+    for dataset, data, labels in datasets:
+        word_length = data.stack().str.len().mean()
+
+        for name, func in get_cases(data, labels, functions=functions).items():
+            print('{} on {} data: {} words x {} languages, word length {:.1f}'.format(name, dataset, *data.shape, word_length))
+
+            d = {'run': run, 'commit': commit, 'function': name, 'dataset': dataset,
+                    'words': data.shape[0], 'languages': data.shape[1], 'word_length': round(word_length, 1), 'repeat': repeat}
+            d.update(measure(func, repeat))
+            results.append(d)
+
+    return pd.DataFrame(results)
+
+
+
+def save_results(results:pd.DataFrame, path_to_results:str):
+    """Append benchmark results to a CSV file so runs can be compared over time
+
+    Args:
+        results (pd.DataFrame): Output of run_benchmarks
+        path_to_results (str): Path to CSV file. Its folder is created if it does not exist
+    """
+
+    folder = os.path.dirname(path_to_results)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+
+    results.to_csv(path_to_results, mode='a', index=False, header=not os.path.exists(path_to_results))
+
+    return
+
+
+
+def compare_results(path_to_results:str, baseline:str=None, metric:str='time_min')->pd.DataFrame:
+    """Compare the latest run with a baseline run
+
+    Args:
+        path_to_results (str): Path to CSV file written by save_results
+        baseline (str, optional): Run timestamp or commit to compare against. Defaults to the run before the latest.
+        metric (str, optional): Column to compare. Defaults to 'time_min'.
+
+    Returns:
+        pd.DataFrame: Baseline and latest values and their ratio for each function and dataset
+    """
+
+    results = pd.read_csv(path_to_results, keep_default_na=False, dtype={'commit': str, 'run': str})
+    runs = list(dict.fromkeys(results['run']))
+
+    latest = runs[-1]
+
+    if baseline is None:
+        if len(runs) < 2:
+            raise ValueError('At least two runs are needed to compare results')
+        baseline = runs[-2]
+
+    elif baseline == latest:
+        raise ValueError('{} is the latest run, compare it with an earlier one'.format(baseline))
+
+    elif baseline not in runs:
+        matches = results.loc[(results['commit']==baseline) & (results['run']!=latest), 'run']
+        if not len(matches):
+            raise ValueError('No run other than the latest found for {}'.format(baseline))
+        baseline = matches.iloc[-1]
+
+    keys = ['function', 'dataset', 'words', 'languages', 'word_length']
+
+    old = results[results['run']==baseline].set_index(keys)[metric]
+    new = results[results['run']==latest].set_index(keys)[metric]
+
+    comparison = pd.DataFrame({'baseline': old, 'latest': new}).dropna()
+    comparison['ratio'] = comparison['latest']/comparison['baseline']
+
+    return comparison
+
+
+
+if __name__=="__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark the analysis functions')
+    parser.add_argument('--sizes', choices=list(SIZES), default='quick', help='Synthetic data sizes to run')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed calls per case')
+    parser.add_argument('--functions', nargs='*', help='Only benchmark these functions')
+    parser.add_argument('--output', default=RESULTS_FILE, help='CSV file results are appended to')
+    parser.add_argument('--compare', nargs='?', const='', help='Compare with a previous run or commit after running')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.repeat, args.functions)
+    save_results(results, args.output)
+
+    print(results.to_string(index=False))
+    print('Results appended to {}'.format(args.output))
+
+    if args.compare is not None:
+        print(compare_results(args.output, args.compare or None).to_string())
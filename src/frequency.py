@@ -0,0 +1,258 @@
+import os, re, hashlib
+import pandas as pd
+import nltk
+from collections import Counter
+from multiprocessing import Pool
+from typing import Union
+
+nltk.download(['wordnet', 'omw-1.4', 'stopwords'])
+from nltk.corpus import wordnet, stopwords
+from nltk.corpus.util import LazyCorpusLoader
+from nltk.corpus.reader import CorpusReader
+
+
+"""This module counts word frequencies in NLTK corpora and text files, caching the vocabulary and ranked counts on disk"""
+
+
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+(?:['-][^\W\d_]+)*")
+
+_vocabularies = {}
+_shard_vocabulary = frozenset()
+
+
+
+def get_vocabulary(path_to_folder:str=None, remove_stopwords:bool=True)->frozenset:
+    """Lowercased WordNet vocabulary, optionally without english stopwords. Cached in memory and, if a folder is given, on disk
+
+    Args:
+        path_to_folder (str, optional): Folder in which the vocabulary is cached as a text file. Defaults to None (memory only).
+        remove_stopwords (bool, optional): Whether stopwords should be removed from the vocabulary. Defaults to True.
+
+    Returns:
+        frozenset: Set of lowercased words
+    """
+
+    path_to_cache = None
+    if path_to_folder is not None:
+        filename = 'vocabulary.txt' if remove_stopwords else 'vocabulary-stopwords.txt'
+        path_to_cache = os.path.join(path_to_folder, filename)
+
+    if remove_stopwords in _vocabularies:
+        vocabulary = _vocabularies[remove_stopwords]
+
+    elif path_to_cache is not None and os.path.exists(path_to_cache):
+        with open(path_to_cache, encoding='utf-8') as f:
+            vocabulary = frozenset(f.read().split('\n'))
+
+    else:
+        vocabulary = set(word.lower() for word in wordnet.words('eng'))
+
+        if remove_stopwords:
+            vocabulary -= set(word.lower() for word in stopwords.words('english'))
+
+        vocabulary = frozenset(vocabulary)
+
+    if path_to_cache is not None and not os.path.exists(path_to_cache):
+        with open(path_to_cache, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(sorted(vocabulary)))
+
+    _vocabularies[remove_stopwords] = vocabulary
+
+    return vocabulary
+
+
+
+def count_tokens(tokens, vocabulary:frozenset)->Counter:
+    """Count occurrences of every token that is in the vocabulary. Tokens are lowercased before matching
+
+    Args:
+        tokens (iterable): Iterable of words, consumed lazily
+        vocabulary (frozenset): Lowercased words to keep
+
+    Returns:
+        Counter: Word -> count
+    """
+
+    # Counting everything first keeps the inner loop in C, filtering the distinct words afterwards is cheap
+    counts = Counter(map(str.lower, tokens))
+
+    return Counter({word: count for word, count in counts.items() if word in vocabulary})
+
+
+
+def tokenize_file(path_to_file:str):
+    """Lazily yield the words of a plain text file, one line at a time
+
+    Args:
+        path_to_file (str): Path to UTF-8 text file
+
+    Yields:
+        str: Word
+    """
+
+    with open(path_to_file, encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            yield from TOKEN_PATTERN.findall(line)
+
+
+
+def _init_shard_worker(vocabulary:frozenset):
+    global _shard_vocabulary
+    _shard_vocabulary = vocabulary
+
+
+
+def _count_shard(shard:tuple)->Counter:
+    corpus_name, fileid = shard
+
+    if corpus_name is None:
+        tokens = tokenize_file(fileid)
+    else:
+        tokens = getattr(nltk.corpus, corpus_name).words(fileid)
+
+    return count_tokens(tokens, _shard_vocabulary)
+
+
+
+def _resolve_corpus(corpus:Union[str, list])->tuple:
+    if isinstance(corpus, str):
+        # A loader turns into its corpus reader class once the corpus is first accessed, so both are accepted
+        if not os.path.exists(corpus) and isinstance(getattr(nltk.corpus, corpus, None), (LazyCorpusLoader, CorpusReader)):
+            return ('nltk', corpus)
+        paths = [corpus]
+
+    else:
+        paths = list(corpus)
+
+    for path in paths:
+        if os.path.isdir(path):
+            raise ValueError('{} is a directory, pass a list of text files instead'.format(path))
+        if not os.path.isfile(path):
+            raise FileNotFoundError('{} is neither a text file nor the name of an NLTK corpus'.format(path))
+
+    return ('files', [os.path.abspath(path) for path in paths])
+
+
+
+def _get_shards(kind:str, source:Union[str, list])->list:
+    if kind == 'files':
+        return [(None, path) for path in source]
+
+    reader = getattr(nltk.corpus, source)
+
+    # Only download corpora that are not installed yet
+    try:
+        fileids = reader.fileids()
+    except LookupError:
+        nltk.download(source, quiet=True)
+        fileids = reader.fileids()
+
+    return [(source, fileid) for fileid in fileids]
+
+
+
+def _cache_name(kind:str, source:Union[str, list], remove_stopwords:bool)->str:
+    suffix = '' if remove_stopwords else '-stopwords'
+
+    if kind == 'nltk':
+        return 'freq-nltk-{}{}.csv'.format(source, suffix)
+
+    # Files are identified by their absolute paths, sizes and modification times, so a changed file gets a new cache
+    h = hashlib.sha256()
+    for path in source:
+        stat = os.stat(path)
+        h.update('{}\0{}\0{}\n'.format(path, stat.st_size, stat.st_mtime_ns).encode())
+
+    return 'freq-files-{}{}.csv'.format(h.hexdigest()[:16], suffix)
+
+
+
+def count_corpus(corpus:Union[str, list], path_to_folder:str=None, remove_stopwords:bool=True, processes:int=1)->Counter:
+    """Stream a corpus through a counter, one shard at a time. Shards are the files of an NLTK corpus or the given text files
+
+    Args:
+        corpus (Union[str, list]): Name of an NLTK corpus (e.g. "brown"), path to a text file, or list of paths to text files
+        path_to_folder (str, optional): Folder in which the vocabulary is cached. Defaults to None.
+        remove_stopwords (bool, optional): Whether stopwords should be excluded from the count. Defaults to True.
+        processes (int, optional): Number of worker processes, None for one per CPU. Defaults to 1 (count in this process).
+
+    Returns:
+        Counter: Word -> count
+    """
+
+    return _count_resolved(*_resolve_corpus(corpus), path_to_folder, remove_stopwords, processes)
+
+
+
+def _count_resolved(kind:str, source:Union[str, list], path_to_folder:str, remove_stopwords:bool, processes:int)->Counter:
+    vocabulary = get_vocabulary(path_to_folder, remove_stopwords)
+    shards = _get_shards(kind, source)
+
+    counts = Counter()
+
+    if processes == 1 or len(shards) == 1:
+        _init_shard_worker(vocabulary)
+        for shard in shards:
+            counts.update(_count_shard(shard))
+
+    else:
+        with Pool(processes, initializer=_init_shard_worker, initargs=(vocabulary,)) as pool:
+            for shard_counts in pool.imap_unordered(_count_shard, shards):
+                counts.update(shard_counts)
+
+    return counts
+
+
+
+def word_frequencies(corpus:Union[str, list], path_to_folder:str=None, remove_stopwords:bool=True, processes:int=1)->pd.Series:
+    """Ranked word frequencies of a corpus. Cached on disk if a folder is given, and recomputed if a text file changes
+
+    Args:
+        corpus (Union[str, list]): Name of an NLTK corpus, path to a text file, or list of paths to text files
+        path_to_folder (str, optional): Folder in which the vocabulary and frequency table are cached. Defaults to None.
+        remove_stopwords (bool, optional): Whether stopwords should be excluded from the count. Defaults to True.
+        processes (int, optional): Number of worker processes, None for one per CPU. Defaults to 1.
+
+    Returns:
+        pd.Series: Word -> count. Sorted from highest to lowest
+    """
+
+    kind, source = _resolve_corpus(corpus)
+    path_to_cache = None
+
+    if path_to_folder is not None:
+        path_to_cache = os.path.join(path_to_folder, _cache_name(kind, source, remove_stopwords))
+
+        if os.path.exists(path_to_cache):
+            return pd.read_csv(path_to_cache, index_col=0, keep_default_na=False)['count']
+
+    counts = _count_resolved(kind, source, path_to_folder, remove_stopwords, processes)
+
+    frequencies = pd.Series(dict(counts.most_common()), name='count', dtype='int64')
+    frequencies.index.name = 'word'
+
+    if path_to_cache is not None:
+        frequencies.to_csv(path_to_cache)
+
+    return frequencies
+
+
+
+def top_words(corpus:Union[str, list], num_words:int=100, path_to_folder:str=None, remove_stopwords:bool=True, processes:int=1)->list:
+    """Most frequent words of a corpus
+
+    Args:
+        corpus (Union[str, list]): Name of an NLTK corpus, path to a text file, or list of paths to text files
+        num_words (int, optional): Number of words to return. Defaults to 100.
+        path_to_folder (str, optional): Folder in which the vocabulary and frequency table are cached. Defaults to None.
+        remove_stopwords (bool, optional): Whether stopwords should be excluded. Defaults to True.
+        processes (int, optional): Number of worker processes if the frequencies are not cached. Defaults to 1.
+
+    Returns:
+        list: Words sorted by number of occurrences from high to low
+    """
+
+    frequencies = word_frequencies(corpus, path_to_folder, remove_stopwords, processes)
+
+    return list(frequencies.index[:int(num_words)])
@@ -4,9 +4,9 @@ from zipfile import ZipFile
 from langcodes import Language, standardize_tag
 
 nltk.download(['wordnet', 'omw-1.4', 'brown', 'stopwords', 'swadesh'])
-from nltk.corpus import wordnet, brown, stopwords, swadesh
+from nltk.corpus import swadesh
 
-import translate
+import translate, frequency
 
 """This module generates the relevant data files before they can be analyzed to obtain the language families"""
 
@@ -69,21 +69,10 @@ def count_word_freq(text:list, remove_stopwords:bool=True)->dict:
         dict: Word -> count. Sorted from highest to lowest
     """
 
-    counts = {}
-    word_set = set(word.lower() for word in wordnet.words('eng'))
+    vocabulary = frequency.get_vocabulary(remove_stopwords=remove_stopwords)
+    counts = frequency.count_tokens(text, vocabulary)
 
-    if remove_stopwords:
-        stop_word_set = set(word.lower() for word in stopwords.words('english'))
-        word_set = word_set - stop_word_set
-
-    for word in text:
-        if word in word_set:
-            word = word.lower()
-            counts[word] = counts.get(word, 0) + 1
-
-    counts = dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
-
-    return counts
+    return dict(counts.most_common())
 
 
 
@@ -156,8 +145,8 @@ def add_brown_words(path_to_native_data:str, path_to_transliterate_data:str, num
         path_to_transliterate_data (str): path to DataFrame containing translations in latin script
         num_words (int, optional): Number of words to add, sorted by number of occurrences from high to low. Defaults to 100.
     """
-    counts = count_word_freq(brown.words(), remove_stopwords=True)
-    brown_words = list(pd.Series(counts).iloc[:100].index)
+    path_to_folder = os.path.dirname(path_to_native_data)
+    brown_words = frequency.top_words('brown', num_words, path_to_folder=path_to_folder, remove_stopwords=True)
 
     add_words_to_data(brown_words, path_to_native_data, path_to_transliterate_data)
 
@@ -165,6 +154,18 @@ def add_brown_words(path_to_native_data:str, path_to_transliterate_data:str, num
 
 
 
+def get_swadesh_words()->list:
+    """First word of every english entry in the Swadesh corpus
+
+    Returns:
+        list: Unique words in corpus order
+    """
+    swadesh_words = pd.Series(swadesh.words('en')).apply(lambda x: x.split()[0])
+
+    return list(dict.fromkeys(swadesh_words))
+
+
+
 def add_swadesh_words(path_to_native_data:str, path_to_transliterate_data):
     """Add words from Swadesh corpus to data files
 
@@ -172,8 +173,7 @@ def add_swadesh_words(path_to_native_data:str, path_to_transliterate_data):
         path_to_native_data (str): path to DataFrame containing translations in native script
         path_to_transliterate_data (str): path to DataFrame containing translations in latin script
     """
-    swadesh_words = swadesh.words('en')
-    swadesh_words = set(pd.Series(swadesh_words).apply(lambda x: x.split()[0]))
+    swadesh_words = get_swadesh_words()
 
     add_words_to_data(swadesh_words, path_to_native_data, path_to_transliterate_data)
 
@@ -311,7 +311,7 @@ if __name__=="__main__":
     if not os.path.exists(path_to_transliterate_data):
         empty_data.to_csv(path_to_transliterate_data)
 
-    num_words = input('Number of most frequent words from the Brown corpus to add: ')
+    num_words = int(input('Number of most frequent words from the Brown corpus to add: '))
 
     print('Adding words from Brown corpus')
 
@@ -0,0 +1,494 @@
+import os, sys, json, time, hashlib, argparse
+import numpy as np
+import pandas as pd
+import scipy as sp
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from scipy.cluster.hierarchy import linkage, fcluster
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory is not recorded there
+    resource = None
+
+# generate downloads NLTK data when it is imported and analyze pulls in the plotting libraries, so both are only imported
+# by the stages that use them. Stage processes started with spawn then do not repeat that work for every stage
+import translate
+
+
+"""This module runs the data generation and analysis as a non-interactive pipeline of stages.
+A stage is skipped when the content hashes of its inputs and outputs match its last successful run"""
+
+
+
+DEFAULT_PARAMS = {
+    'num_words': 100,
+    'closest_words': 40,
+    'linkage': 'ward',
+    'n_clusters': 24
+}
+
+MANIFEST_FILE = 'pipeline-manifest.json'
+LOG_FILE = 'pipeline-log.jsonl'
+
+
+
+def _count_rows(path:str, **kwargs)->int:
+    return len(pd.read_csv(path, usecols=[0], **kwargs))
+
+
+
+def discover_languages(path_to_folder:str, params:dict)->dict:
+    """Languages available to Azure with latin output"""
+
+    import generate
+
+    languages = generate.final_languages()
+    languages.to_csv(os.path.join(path_to_folder, 'languages.csv'))
+
+    return {'languages.csv': languages.shape[1]}
+
+
+
+def download_asjp(path_to_folder:str, params:dict)->dict:
+    """Languages, words and wordlist from the ASJP"""
+
+    import generate
+
+    generate.get_asjp_data(path_to_folder)
+
+    files = ['asjp-languages.csv', 'asjp-words.csv', 'asjp-wordlist.csv']
+
+    return {file: _count_rows(os.path.join(path_to_folder, file)) for file in files}
+
+
+
+def attach_families(path_to_folder:str, params:dict)->dict:
+    """Language families from the ASJP added to languages.csv"""
+
+    import generate
+
+    generate.add_language_families(path_to_folder)
+
+    languages = pd.read_csv(os.path.join(path_to_folder, 'languages.csv'), index_col=0)
+
+    return {'languages.csv': languages.shape[1]}
+
+
+
+def translate_words(path_to_folder:str, params:dict)->dict:
+    """Brown corpus, Swadesh and ASJP words translated to every language in languages.csv.
+    Rows for words that are no longer requested are dropped, so the files only depend on the inputs and parameters.
+    Existing translations are reused unless the languages changed"""
+
+    import generate, frequency
+
+    path_to_native_data = os.path.join(path_to_folder, 'data-native.csv')
+    path_to_transliterate_data = os.path.join(path_to_folder, 'data-latin.csv')
+
+    languages = pd.read_csv(os.path.join(path_to_folder, 'languages.csv'), index_col=0).columns
+
+    asjp_words = pd.read_csv(os.path.join(path_to_folder, 'asjp-wordlist.csv'))['Name'].apply(lambda x: x.lower().replace('*', ''))
+    words = frequency.top_words('brown', params['num_words'], path_to_folder=path_to_folder) + generate.get_swadesh_words() + list(asjp_words)
+    words = list(dict.fromkeys(words))
+
+    for path in [path_to_native_data, path_to_transliterate_data]:
+        data = pd.DataFrame(columns=languages, index=pd.Series(dtype='object', name='word'), dtype='object')
+
+        if os.path.exists(path):
+            existing = pd.read_csv(path, index_col=0)
+            if list(existing.columns) == list(languages):
+                data = existing[existing.index.isin(words)]
+
+        data.to_csv(path)
+
+    generate.add_words_to_data(words, path_to_native_data, path_to_transliterate_data)
+
+    # add_words_to_data translates to the languages Azure offers now, keep only those in languages.csv
+    for path in [path_to_native_data, path_to_transliterate_data]:
+        pd.read_csv(path, index_col=0).reindex(index=words, columns=languages).to_csv(path)
+
+    return {'data-native.csv': _count_rows(path_to_native_data), 'data-latin.csv': _count_rows(path_to_transliterate_data)}
+
+
+
+def compute_distances(path_to_folder:str, params:dict)->dict:
+    """Pairwise edit distance between languages for every word, stored condensed with one row per word"""
+
+    import analyze
+
+    data = pd.read_csv(os.path.join(path_to_folder, 'data-latin.csv'), index_col=0).fillna('')
+
+    pw_distances = analyze.pairwise_word_distances(data)
+    distances = np.vstack(pw_distances.apply(sp.spatial.distance.squareform))
+
+    np.savez_compressed(os.path.join(path_to_folder, 'distances.npz'), distances=distances,
+                words=data.index.values.astype(str), languages=data.columns.values.astype(str))
+
+    return {'distances.npz': distances.shape[0]}
+
+
+
+def cluster_languages(path_to_folder:str, params:dict)->dict:
+    """Hierarchical clustering on the total distance to the closest words"""
+
+    with np.load(os.path.join(path_to_folder, 'distances.npz')) as f:
+        distances, languages = f['distances'], f['languages']
+
+    X = np.sort(distances, axis=0)[:params['closest_words']].sum(axis=0)
+    X = X/X.max()
+
+    Z = linkage(X, method=params['linkage'], optimal_ordering=True)
+    np.save(os.path.join(path_to_folder, 'linkage.npy'), Z)
+
+    language_data = pd.read_csv(os.path.join(path_to_folder, 'languages.csv'), index_col=0)
+
+    clusters = language_data.loc[['name', 'family'], languages].T
+    clusters['cluster'] = fcluster(Z, params['n_clusters'], criterion='maxclust')
+    clusters.to_csv(os.path.join(path_to_folder, 'clusters.csv'))
+
+    return {'clusters.csv': len(clusters)}
+
+
+
+# Stages in the order they would run sequentially. A stage depends on the most recent earlier stage that writes one of its
+# inputs or outputs, stages without a dependency between them run concurrently. A file that is both an input and an output
+# is modified in place. Each stage returns the number of records in every file it writes, which are rows except for
+# languages.csv, where every column is a language
+STAGES = [
+    {'name': 'languages', 'func': discover_languages, 'inputs': [], 'outputs': ['languages.csv'], 'params': []},
+    {'name': 'asjp', 'func': download_asjp, 'inputs': [],
+        'outputs': ['asjp-languages.csv', 'asjp-words.csv', 'asjp-wordlist.csv'], 'params': []},
+    {'name': 'families', 'func': attach_families, 'inputs': ['languages.csv', 'asjp-languages.csv'], 'outputs': ['languages.csv'],
+        'params': []},
+    {'name': 'translations', 'func': translate_words, 'inputs': ['languages.csv', 'asjp-wordlist.csv'],
+        'outputs': ['data-native.csv', 'data-latin.csv'], 'params': ['num_words']},
+    {'name': 'distances', 'func': compute_distances, 'inputs': ['data-latin.csv'], 'outputs': ['distances.npz'], 'params': []},
+    {'name': 'clustering', 'func': cluster_languages, 'inputs': ['distances.npz', 'languages.csv'],
+        'outputs': ['linkage.npy', 'clusters.csv'], 'params': ['closest_words', 'linkage', 'n_clusters']}
+]
+
+
+
+def get_stage(name:str, definitions:list=STAGES)->dict:
+    """Stage definition with the given name
+
+    Args:
+        name (str): Name of the stage
+        definitions (list, optional): Stage definitions. Defaults to STAGES.
+
+    Raises:
+        KeyError: If there is no stage with that name
+
+    Returns:
+        dict: Stage definition
+    """
+
+    for stage in definitions:
+        if stage['name'] == name:
+            return stage
+
+    raise KeyError('Unknown stage {}'.format(name))
+
+
+
+def get_dependencies(definitions:list=STAGES)->dict:
+    """Upstream stages of every stage, from the files they read and write
+
+    Args:
+        definitions (list, optional): Stage definitions in sequential order. Defaults to STAGES.
+
+    Returns:
+        dict: Stage name -> set of stage names that must finish first
+    """
+
+    dependencies = {}
+    last_writer = {}
+
+    for stage in definitions:
+        dependencies[stage['name']] = {last_writer[file] for file in stage['inputs'] + stage['outputs'] if file in last_writer}
+
+        for file in stage['outputs']:
+            last_writer[file] = stage['name']
+
+    return dependencies
+
+
+
+def hash_file(path:str)->str:
+    """SHA-256 of a file's contents, or None if it does not exist
+
+    Args:
+        path (str): Path to file
+
+    Returns:
+        str: Hex digest
+    """
+
+    if not os.path.exists(path):
+        return None
+
+    h = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+
+def _recorded_hash(file:str, manifest:dict, definitions:list, before:str=None)->str:
+    """Hash of a file as written by the last stage (before the given one) that wrote it in a recorded run"""
+
+    names = [stage['name'] for stage in definitions]
+    writers = [stage['name'] for stage in definitions if file in stage['outputs']]
+
+    if before is not None:
+        writers = [name for name in writers if names.index(name) < names.index(before)]
+
+    for name in reversed(writers):
+        if name in manifest:
+            return manifest[name]['outputs'].get(file)
+
+    return None
+
+
+
+def stage_key(stage:dict, path_to_folder:str, params:dict, manifest:dict, definitions:list=STAGES)->str:
+    """Content hash of everything a stage reads: input files and parameters.
+    Files modified in place are hashed as the upstream stage wrote them, not as this stage left them
+
+    Args:
+        stage (dict): Stage definition
+        path_to_folder (str): Path to data folder
+        params (dict): Pipeline parameters
+        manifest (dict): Record of the last successful run of each stage
+        definitions (list, optional): Stage definitions in sequential order. Defaults to STAGES.
+
+    Returns:
+        str: Hex digest
+    """
+
+    inputs = {}
+
+    for file in stage['inputs']:
+        if file in stage['outputs']:
+            inputs[file] = _recorded_hash(file, manifest, definitions, before=stage['name'])
+        else:
+            inputs[file] = hash_file(os.path.join(path_to_folder, file))
+
+    key = {'inputs': inputs, 'params': {name: params[name] for name in stage['params']}}
+
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+
+def is_up_to_date(stage:dict, path_to_folder:str, key:str, manifest:dict, definitions:list=STAGES)->bool:
+    """Whether a stage ran with the same inputs and its outputs have only been changed by later stages since
+
+    Args:
+        stage (dict): Stage definition
+        path_to_folder (str): Path to data folder
+        key (str): Current stage key
+        manifest (dict): Record of the last successful run of each stage
+        definitions (list, optional): Stage definitions in sequential order. Defaults to STAGES.
+
+    Returns:
+        bool: True if the stage can be skipped
+    """
+
+    record = manifest.get(stage['name'])
+
+    if record is None or record['key'] != key:
+        return False
+
+    return all(hash_file(os.path.join(path_to_folder, file)) == _recorded_hash(file, manifest, definitions) for file in stage['outputs'])
+
+
+
+def _peak_rss_mb()->float:
+    if resource is None:
+        return None
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Reported in bytes on macOS and kilobytes elsewhere
+    return maxrss/2**20 if sys.platform == 'darwin' else maxrss/2**10
+
+
+
+def _run_stage(func, path_to_folder:str, params:dict)->dict:
+    # Every stage gets a fresh process, so the growth of its peak resident memory is the memory the stage itself needed
+    start_rss = _peak_rss_mb()
+
+    start = time.perf_counter()
+    rows = func(path_to_folder, params)
+    wall_time = time.perf_counter() - start
+
+    end_rss = _peak_rss_mb()
+    peak_memory = None if start_rss is None else end_rss - start_rss
+
+    return {'wall_time': wall_time, 'peak_memory_mb': peak_memory, 'rows': rows}
+
+
+
+def _log(path_to_log:str, record:dict):
+    print('[{}] {}: {}'.format(record['stage'], record['status'],
+                ', '.join('{}={}'.format(k, v) for k, v in record.items() if k in ['wall_time', 'peak_memory_mb', 'rows'])))
+
+    with open(path_to_log, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+
+def run_pipeline(path_to_folder:str, params:dict=None, stages:list=None, force:list=None, max_workers:int=None,
+            definitions:list=STAGES)->dict:
+    """Run the pipeline, skipping up to date stages and running independent stages in parallel processes.
+    Each stage runs in a fresh process so its peak memory can be measured without slowing it down
+
+    Args:
+        path_to_folder (str): Path to data folder. Created if it does not exist
+        params (dict, optional): Overrides for DEFAULT_PARAMS. Defaults to None.
+        stages (list, optional): Names of stages to consider. Stages left out are assumed to be complete. Defaults to None (all).
+        force (list, optional): Names of stages to run even if they are up to date. Defaults to None.
+        max_workers (int, optional): Maximum number of stages running at once. Defaults to None (one per CPU).
+        definitions (list, optional): Stage definitions in sequential order. Defaults to STAGES.
+
+    Raises:
+        RuntimeError: If a stage fails. Stages that do not depend on it still run and are recorded in the manifest
+
+    Returns:
+        dict: Stage name -> 'ran' or 'skipped'
+    """
+
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    stages = [stage['name'] for stage in definitions] if stages is None else [get_stage(name, definitions)['name'] for name in stages]
+    force = {get_stage(name, definitions)['name'] for name in force or []}
+    max_workers = max_workers or os.cpu_count() or 1
+
+    if not os.path.exists(path_to_folder):
+        os.mkdir(path_to_folder)
+
+    path_to_manifest = os.path.join(path_to_folder, MANIFEST_FILE)
+    path_to_log = os.path.join(path_to_folder, LOG_FILE)
+
+    manifest = {}
+    if os.path.exists(path_to_manifest):
+        with open(path_to_manifest) as f:
+            manifest = json.load(f)
+
+    def save_manifest():
+        with open(path_to_manifest, 'w') as f:
+            json.dump(manifest, f, indent=4)
+
+    run = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    dependencies = {name: deps & set(stages) for name, deps in get_dependencies(definitions).items() if name in stages}
+
+    status = {}
+    keys = {}
+    running = {}
+    executors = {}
+    failed = None
+
+    while True:
+
+        waiting = [name for name in stages if name not in status and name not in running.values()]
+
+        # Stages below a failed stage are not run
+        blocked = [name for name in waiting if any(status.get(dep) in ['failed', 'blocked'] for dep in dependencies[name])]
+
+        for name in blocked:
+            status[name] = 'blocked'
+            _log(path_to_log, {'run': run, 'stage': name, 'status': 'blocked'})
+
+        if blocked:
+            continue
+
+        # Start every stage whose dependencies have finished, repeating while skipped stages unblock others
+        ready = [name for name in waiting if all(status.get(dep) in ['ran', 'skipped'] for dep in dependencies[name])]
+        skipped = False
+
+        for name in ready:
+            stage = get_stage(name, definitions)
+            keys[name] = stage_key(stage, path_to_folder, params, manifest, definitions)
+
+            if name not in force and is_up_to_date(stage, path_to_folder, keys[name], manifest, definitions):
+                status[name] = 'skipped'
+                skipped = True
+                _log(path_to_log, {'run': run, 'stage': name, 'status': 'skipped', 'key': keys[name]})
+
+            elif len(running) < max_workers:
+                # A single use pool gives the stage a fresh process without needing max_tasks_per_child
+                executor = ProcessPoolExecutor(1)
+                future = executor.submit(_run_stage, stage['func'], path_to_folder, params)
+                running[future] = name
+                executors[future] = executor
+
+        if skipped:
+            continue
+
+        if not running:
+            break
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            name = running.pop(future)
+            executors.pop(future).shutdown()
+            stage = get_stage(name, definitions)
+
+            try:
+                result = future.result()
+            except Exception as e:
+                failed = failed or (name, e)
+                status[name] = 'failed'
+
+                # Outputs may be partly written, so the stage must run again next time
+                manifest.pop(name, None)
+                save_manifest()
+
+                _log(path_to_log, {'run': run, 'stage': name, 'status': 'failed', 'error': repr(e)})
+                continue
+
+            status[name] = 'ran'
+            manifest[name] = {
+                'key': keys[name],
+                'outputs': {file: hash_file(os.path.join(path_to_folder, file)) for file in stage['outputs']},
+                'run': run
+            }
+            save_manifest()
+
+            _log(path_to_log, {'run': run, 'stage': name, 'status': 'ran', 'key': keys[name], **result})
+
+    if failed is not None:
+        raise RuntimeError('Stage {} failed'.format(failed[0])) from failed[1]
+
+    return status
+
+
+
+if __name__=="__main__":
+
+    parser = argparse.ArgumentParser(description='Generate data and cluster languages')
+    parser.add_argument('path_to_folder', help='Location of data folder')
+    parser.add_argument('--key', help='Location of key to authenticate translation service')
+    parser.add_argument('--stages', nargs='*', choices=[stage['name'] for stage in STAGES], help='Only run these stages')
+    parser.add_argument('--force', nargs='*', default=[], choices=[stage['name'] for stage in STAGES],
+                help='Run these stages even if they are up to date')
+    parser.add_argument('--workers', type=int, help='Maximum number of stages running at once')
+
+    for name, value in DEFAULT_PARAMS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=type(value), default=value)
+
+    args = parser.parse_args()
+
+    if args.key:
+        translate.authenticate(args.key)
+
+    params = {name: getattr(args, name) for name in DEFAULT_PARAMS}
+
+    run_pipeline(args.path_to_folder, params, args.stages, args.force, args.workers)
+
+    print('Pipeline successfully complete')
@@ -0,0 +1,157 @@
+import os, sys, json
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import pipeline
+
+
+"""Offline checks of the pipeline runner using stub stages that read and write small text files"""
+
+
+
+def _read(path_to_folder, file):
+    with open(os.path.join(path_to_folder, file)) as f:
+        return f.read()
+
+
+def _write(path_to_folder, file, text):
+    with open(os.path.join(path_to_folder, file), 'w') as f:
+        f.write(text)
+
+
+def base(path_to_folder, params):
+    _write(path_to_folder, 'a.txt', _read(path_to_folder, 'source.txt').upper())
+    return {'a.txt': 1}
+
+
+def in_place(path_to_folder, params):
+    _write(path_to_folder, 'a.txt', _read(path_to_folder, 'a.txt') + '+')
+    return {'a.txt': 1}
+
+
+def middle(path_to_folder, params):
+    text = _read(path_to_folder, 'a.txt')
+    if 'FAIL' in text:
+        raise ValueError('middle failed')
+    _write(path_to_folder, 'b.txt', text + params['suffix'])
+    return {'b.txt': 1}
+
+
+def leaf(path_to_folder, params):
+    _write(path_to_folder, 'c.txt', _read(path_to_folder, 'b.txt') + 'c')
+    return {'c.txt': 1}
+
+
+def side(path_to_folder, params):
+    _write(path_to_folder, 'd.txt', _read(path_to_folder, 'other.txt') + 'd')
+    return {'d.txt': 1}
+
+
+STUBS = [
+    {'name': 'base', 'func': base, 'inputs': ['source.txt'], 'outputs': ['a.txt'], 'params': []},
+    {'name': 'in_place', 'func': in_place, 'inputs': ['a.txt'], 'outputs': ['a.txt'], 'params': []},
+    {'name': 'middle', 'func': middle, 'inputs': ['a.txt'], 'outputs': ['b.txt'], 'params': ['suffix']},
+    {'name': 'leaf', 'func': leaf, 'inputs': ['b.txt'], 'outputs': ['c.txt'], 'params': []},
+    {'name': 'side', 'func': side, 'inputs': ['other.txt'], 'outputs': ['d.txt'], 'params': []}
+]
+
+
+@pytest.fixture
+def folder(tmp_path):
+    _write(tmp_path, 'source.txt', 'x')
+    _write(tmp_path, 'other.txt', 'y')
+    return str(tmp_path)
+
+
+def run(folder, **kwargs):
+    kwargs.setdefault('params', {'suffix': 'b'})
+    return pipeline.run_pipeline(folder, definitions=STUBS, **kwargs)
+
+
+def last_run(folder):
+    with open(os.path.join(folder, pipeline.LOG_FILE)) as f:
+        records = [json.loads(line) for line in f]
+    return {record['stage']: record for record in records if record['run'] == records[-1]['run']}
+
+
+
+def test_dependencies():
+    assert pipeline.get_dependencies(STUBS) == {
+        'base': set(), 'in_place': {'base'}, 'middle': {'in_place'}, 'leaf': {'middle'}, 'side': set()
+    }
+
+    dependencies = pipeline.get_dependencies()
+    assert dependencies['families'] == {'languages', 'asjp'}
+    assert dependencies['translations'] == {'families', 'asjp'}
+    assert dependencies['clustering'] == {'distances', 'families'}
+
+
+def test_first_run_runs_everything(folder):
+    assert set(run(folder).values()) == {'ran'}
+    assert _read(folder, 'c.txt') == 'X+bc'
+
+    record = last_run(folder)['middle']
+    assert record['rows'] == {'b.txt': 1}
+    assert record['wall_time'] >= 0
+
+
+def test_second_run_skips_everything(folder):
+    run(folder)
+    assert set(run(folder).values()) == {'skipped'}
+    assert _read(folder, 'a.txt') == 'X+'
+
+
+def test_upstream_edit_reruns_only_downstream(folder):
+    run(folder)
+    _write(folder, 'source.txt', 'z')
+
+    assert run(folder) == {'base': 'ran', 'in_place': 'ran', 'middle': 'ran', 'leaf': 'ran', 'side': 'skipped'}
+    assert _read(folder, 'c.txt') == 'Z+bc'
+
+
+def test_param_change_reruns_only_downstream(folder):
+    run(folder)
+
+    status = run(folder, params={'suffix': 'B'})
+    assert status == {'base': 'skipped', 'in_place': 'skipped', 'middle': 'ran', 'leaf': 'ran', 'side': 'skipped'}
+
+
+def test_edited_output_reruns_stage(folder):
+    run(folder)
+    _write(folder, 'b.txt', 'edited')
+
+    status = run(folder)
+    assert status['middle'] == 'ran'
+    assert status['leaf'] == 'skipped'
+    assert _read(folder, 'b.txt') == 'X+b'
+
+
+def test_force(folder):
+    run(folder)
+
+    status = run(folder, force=['leaf'])
+    assert status['leaf'] == 'ran'
+    assert [name for name, value in status.items() if value == 'ran'] == ['leaf']
+
+
+def test_failed_stage_blocks_dependents(folder):
+    _write(folder, 'source.txt', 'fail')
+
+    with pytest.raises(RuntimeError, match='middle'):
+        run(folder)
+
+    records = last_run(folder)
+    assert records['middle']['status'] == 'failed'
+    assert records['leaf']['status'] == 'blocked'
+    assert records['side']['status'] == 'ran'
+    assert not os.path.exists(os.path.join(folder, 'c.txt'))
+
+    _write(folder, 'source.txt', 'x')
+    status = run(folder)
+    assert status == {'base': 'ran', 'in_place': 'ran', 'middle': 'ran', 'leaf': 'ran', 'side': 'skipped'}
+
+
+def test_unknown_stage(folder):
+    with pytest.raises(KeyError):
+        run(folder, force=['lef'])